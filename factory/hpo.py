@@ -16,7 +16,8 @@ def hpo_factory(base_importer_cls:str, backend:str):
             queries = ["CREATE CONSTRAINT n10s_unique_uri IF NOT EXISTS FOR (r:Resource) REQUIRE r.uri IS UNIQUE;",
                        "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Resource) REQUIRE (n.id) IS UNIQUE;",
                        "CREATE INDEX disease_id IF NOT EXISTS FOR (n:HpoDisease) ON (n.id);",
-                       "CREATE INDEX phenotype_id IF NOT EXISTS FOR (n:HpoPhenotype) ON (n.id);"]
+                       "CREATE INDEX phenotype_id IF NOT EXISTS FOR (n:HpoPhenotype) ON (n.id);",
+                       "CREATE INDEX disease_hpo_count IF NOT EXISTS FOR (n:HpoDisease) ON (n.hpoCount);"]
             with self._driver.session(database=self._database) as session:
                 for q in queries:
                     try:
@@ -180,6 +181,22 @@ def hpo_factory(base_importer_cls:str, backend:str):
             with self._driver.session(database=self._database) as session:
                 session.run(query)
         
+        def aggregate_disease_phenotypes(self):
+            # Phenotype set per disease as node properties, read by the coverage query
+            query = """
+                    CALL apoc.periodic.iterate(
+                        "MATCH (dis:HpoDisease) RETURN dis",
+                        "WITH dis, COLLECT {
+                            MATCH (dis)-[:HAS_PHENOTYPIC_FEATURE]->(phe:HpoPhenotype)
+                            RETURN DISTINCT phe.id
+                        } AS ids
+                        SET dis.hpoIds = ids, dis.hpoCount = size(ids)",
+                        {batchSize: 1000})
+                    """
+
+            with self._driver.session(database=self._database) as session:
+                session.run(query)
+
         def apply_updates(self):
             logging.info("Loading constraints and indexes...")
             self.set_constraints()
@@ -211,6 +228,9 @@ def hpo_factory(base_importer_cls:str, backend:str):
             logging.info("Removing unused nodes...")
             self.remove_unused_node()
 
+            logging.info("Aggregating disease phenotype sets...")
+            self.aggregate_disease_phenotypes()
+
     return HPOImporter
 
 
@@ -11,6 +11,7 @@ from langchain_openai import ChatOpenAI
 from util.config_loader import load_config_api
 from util.api_client import ApiClient
 from llm.utils import EmbedAPI
+from llm.chain import LLM_RESPONSE_CACHE
 from llm.tool import build_ontology_mapper_tool
 
 
@@ -146,6 +147,7 @@ def ontology_mapper_factory(base_importer_cls, backend: str, config_path: str =
                 stop=["<end_of_turn>", "</s>", "\nUser:", "\n\nUser:"],
                 frequency_penalty=0.2,
                 presence_penalty=0.0,
+                cache=LLM_RESPONSE_CACHE,
             )
             self.ontology_mapper_tool = build_ontology_mapper_tool(self.llm)
 
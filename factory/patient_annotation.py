@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import hashlib
 import logging
-from typing import List
+from collections import OrderedDict
+from typing import Dict, List
 
+from langchain_core.exceptions import OutputParserException
+from langchain_core.tools import ToolException
 from langchain_openai import ChatOpenAI
 import pandas as pd
+from pydantic import ValidationError
 from tqdm import tqdm
 
 from util.config_loader import load_config_api
 from util.api_client import ApiClient
 from llm.utils import EmbedAPI
+from llm.chain import LLM_RESPONSE_CACHE
 from llm.pydantic_model import (
     PatientNERInput,
     PatientNERResponse,
@@ -18,8 +24,11 @@ from llm.pydantic_model import (
     PatientNEDOtherMention,
     PatientNEDInput,
     PatientNEDResponse,
+    PatientNEDBatchItem,
+    PatientNEDBatchInput,
+    PatientNEDBatchResponse,
 )
-from llm.tool import build_patient_ner_tool, build_patient_ned_tool
+from llm.tool import build_patient_ner_tool, build_patient_ned_tool, build_patient_ned_batch_tool
 
 
 logging.getLogger("openai").setLevel(logging.WARNING)
@@ -68,14 +77,20 @@ def patient_annotation_factory(base_importer_cls, backend: str, config_path: str
                 stop=["<end_of_turn>", "</s>", "\nUser:", "\n\nUser:"],
                 frequency_penalty=0.2,
                 presence_penalty=0.0,
+                cache=LLM_RESPONSE_CACHE,
             )
             self.patient_ner_tool = build_patient_ner_tool(self.llm)
             self.patient_ned_tool = build_patient_ned_tool(self.llm)
+            self.patient_ned_batch_tool = build_patient_ned_batch_tool(self.llm)
 
             # Patient NED parameters
             self.target_index_name = "icd_disease_embedding"
             self.k = 10
 
+            # NED results keyed by (span text, assertion, candidate ids); LRU-bounded
+            self.ned_cache_size = 10_000
+            self._ned_cache: OrderedDict[bytes, PatientNEDResponse] = OrderedDict()
+
         ###########################
         ### NER on Patient Data ###
         ###########################
@@ -103,7 +118,7 @@ def patient_annotation_factory(base_importer_cls, backend: str, config_path: str
             }
         
         def ner_mention(self, input_data: PatientNERInput) -> PatientNEREntity:
-            validated = PatientNERInput.model_validate(input_data.model_dump())
+            validated = PatientNERInput.model_validate(input_data)
             icd_chapters = validated.icd_chapters
             patient_id = validated.patient_id
             encounter_id = validated.encounter_id
@@ -167,15 +182,125 @@ def patient_annotation_factory(base_importer_cls, backend: str, config_path: str
         }
         
         def disambiguate_mention(self, input_data: PatientNEDInput) -> PatientNEDResponse:
-            validated = PatientNEDInput.model_validate(input_data.model_dump())
+            validated = PatientNEDInput.model_validate(input_data)
             mention = validated.mention
             candidates = validated.candidates
             other_mentions = validated.other_mentions
+            key = self._ned_cache_key(mention, candidates)
+            cached = self._ned_cache_get(key)
+            if cached is not None:
+                return cached.model_copy(update=mention.model_dump())
             payload = self.to_patient_ned_payload(mention, candidates, other_mentions)
             tool_output = self.patient_ned_tool.invoke(payload)
             response = PatientNEDResponse.model_validate(tool_output)
+            self._ned_cache_put(key, response)
             return response
 
+        @staticmethod
+        def _ned_cache_key(mention: PatientNEREntity, candidates: List[PatientNEDCandidate]) -> bytes:
+            """Content address of a NED decision: span text, assertion and candidate ids."""
+            h = hashlib.blake2b(digest_size=16)
+            h.update(mention.text.lower().encode())
+            h.update(b"|")
+            h.update(mention.assertion.encode())
+            h.update(b"|")
+            h.update(b",".join(sorted(c.id.encode() for c in candidates)))
+            return h.digest()
+
+        def _ned_cache_get(self, key: bytes) -> PatientNEDResponse | None:
+            hit = self._ned_cache.get(key)
+            if hit is not None:
+                self._ned_cache.move_to_end(key)
+            return hit
+
+        def _ned_cache_put(self, key: bytes, response: PatientNEDResponse) -> None:
+            self._ned_cache[key] = response
+            self._ned_cache.move_to_end(key)
+            while len(self._ned_cache) > self.ned_cache_size:
+                self._ned_cache.popitem(last=False)
+
+        @staticmethod
+        def _same_span(entity: PatientNEREntity, mention: PatientNEREntity) -> bool:
+            """Whether a batch NED entry refers to the given input mention."""
+            return (
+                entity.text == mention.text
+                and entity.start == mention.start
+                and entity.end == mention.end
+            )
+
+        def disambiguate_mentions(self, input_data: PatientNEDBatchInput) -> List[PatientNEDResponse]:
+            """Link all mentions of an encounter with one LLM call; preserve input order.
+
+            Mentions already linked (same span text, assertion and candidate set) are
+            served from the cache and repeated spans are sent only once. A batch entry
+            is trusted only if its text and offsets match the mention at the same
+            position; any other mention, or every mention of a batch whose call
+            fails, falls back to its own per-mention call.
+            """
+            validated = PatientNEDBatchInput.model_validate(input_data)
+            if not validated.mentions:
+                return []
+
+            keys = [self._ned_cache_key(item.mention, item.candidates) for item in validated.mentions]
+            linked: Dict[bytes, PatientNEDResponse] = {}
+            pending: Dict[bytes, PatientNEDBatchItem] = {}
+            for key, item in zip(keys, validated.mentions):
+                if key in linked or key in pending:
+                    continue
+                cached = self._ned_cache_get(key)
+                if cached is not None:
+                    linked[key] = cached
+                else:
+                    pending[key] = item
+
+            if pending:
+                batch = PatientNEDBatchInput(
+                    mentions=list(pending.values()),
+                    other_mentions=validated.other_mentions,
+                )
+                try:
+                    tool_output = self.patient_ned_batch_tool.invoke(batch.model_dump())
+                    entities = PatientNEDBatchResponse.model_validate(tool_output).entities
+                    batch_failed = False
+                except (ValidationError, OutputParserException, ToolException) as e:
+                    logging.warning(
+                        "Batch NED failed for %d mentions (%s); falling back to per-mention NED.",
+                        len(pending), e,
+                    )
+                    entities = []
+                    batch_failed = True
+
+                items = list(pending.items())
+                misaligned: List[int] = []
+                for i, (key, item) in enumerate(items):
+                    entity = entities[i] if i < len(entities) else None
+                    if entity is not None and self._same_span(entity, item.mention):
+                        result = entity.model_copy(update=item.mention.model_dump())
+                        self._ned_cache_put(key, result)
+                        linked[key] = result
+                    else:
+                        misaligned.append(i)
+
+                if misaligned and not batch_failed:
+                    logging.warning(
+                        "Batch NED returned %d entities for %d mentions, %d not matching their mention; "
+                        "falling back to per-mention NED for those.",
+                        len(entities), len(items), len(misaligned),
+                    )
+                    for i in misaligned:
+                        key, item = items[i]
+                        # disambiguate_mention caches its own result
+                        linked[key] = self.disambiguate_mention(PatientNEDInput(
+                            mention=item.mention,
+                            candidates=item.candidates,
+                            other_mentions=[om for om in validated.other_mentions if om.text != item.mention.text],
+                        ))
+
+            return [
+                linked[key].model_copy(update=item.mention.model_dump())
+                for key, item in zip(keys, validated.mentions)
+            ]
+
         ##############################################
         ### Orchestration: read, filter, and write ###
         ##############################################
@@ -220,21 +345,21 @@ def patient_annotation_factory(base_importer_cls, backend: str, config_path: str
                     narrative_text=row_dict["Narrative"],
                 )
                 ner_output = self.ner_mention(ner_input_data)
-                ned_entities = []
-                for entity in ner_output.entities:
-                    candidates = self.select_candidates(text=entity.text)
-                    ned_input_data = PatientNEDInput(
-                        mention=entity,
-                        candidates=candidates,
-                        other_mentions=[
-                            PatientNEDOtherMention(
-                                text=e.text,
-                                label=e.label,
-                            ) for e in ner_output.entities if e.text != entity.text
-                        ],
-                    )
-                    ned_response = self.disambiguate_mention(ned_input_data)
-                    ned_entities.append(ned_response.model_dump())
+                ned_input_data = PatientNEDBatchInput(
+                    mentions=[
+                        PatientNEDBatchItem(
+                            mention=entity,
+                            candidates=self.select_candidates(text=entity.text),
+                        ) for entity in ner_output.entities
+                    ],
+                    other_mentions=[
+                        PatientNEDOtherMention(
+                            text=e.text,
+                            label=e.label,
+                        ) for e in ner_output.entities
+                    ],
+                )
+                ned_entities = [r.model_dump() for r in self.disambiguate_mentions(ned_input_data)]
                 row_dict["NER_Entities"] = [e.model_dump() for e in ner_output.entities]
                 row_dict["NED_Entities"] = ned_entities
                 row_dict['ICD10_Codes'] = [e["icd_id"] for e in ned_entities if e["icd_id"] is not None]
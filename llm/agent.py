@@ -5,6 +5,7 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
 from llm.chain import (
+    LLM_RESPONSE_CACHE,
     get_guardrails_chain,
     get_final_answer_chain,
 )
@@ -14,8 +15,7 @@ from llm.tool import build_patient_info_tool
 from llm.query_factory import (
     get_patient_icd_codes,
     map_icd_to_hpo,
-    rollup_hpo_to_ancestors,
-    compute_coverage,
+    compute_coverage_from_hpo,
 )
 
 from llm.pipeline import text2cypher_pipeline
@@ -26,7 +26,6 @@ class AgentState(TypedDict, total=False):
     patient_id: Optional[str]
     icd_codes: List[str]
     hpo_ids: List[str]
-    target_ids: List[str]
     results: Any
     steps: List[str]
     mode: str  # "stepwise", "text2cypher", or "patient_info"
@@ -48,6 +47,7 @@ llm = ChatOpenAI(
     stop=["<end_of_turn>", "</s>", "\nUser:", "\n\nUser:"],
     frequency_penalty=0.2,
     presence_penalty=0.0,
+    cache=LLM_RESPONSE_CACHE,
 )
 
 patient_info_tool = build_patient_info_tool(llm)
@@ -118,22 +118,6 @@ def node_icd_to_hpo(state: AgentState) -> AgentState:
         }
 
 
-def node_rollup(state: AgentState) -> AgentState:
-    try:
-        targets = rollup_hpo_to_ancestors(state.get("hpo_ids") or [])
-        return {
-            **state,
-            "target_ids": targets,
-            "steps": [*(state.get("steps") or []), "rollup"],
-        }
-    except Exception as e:
-        return {
-            **state,
-            "error": f"Roll-up failed: {e}",
-            "steps": [*(state.get("steps") or []), "rollup"],
-        }
-
-
 def node_patient_info(state: AgentState) -> AgentState:
     """Use the patient_info tool to explain the virtualized patient node."""
     pid = state.get("patient_id")
@@ -165,7 +149,8 @@ def node_patient_info(state: AgentState) -> AgentState:
 
 def node_coverage(state: AgentState) -> AgentState:
     try:
-        results = compute_coverage(state.get("target_ids") or [], limit=20)
+        # Ancestor roll-up runs inside the coverage query
+        results = compute_coverage_from_hpo(state.get("hpo_ids") or [], limit=20)
         return {
             **state,
             "results": results,
@@ -226,7 +211,6 @@ def build_graph() -> Any:
     graph.add_node("extract", node_extract_inputs)
     graph.add_node("get_icd", node_get_icd)
     graph.add_node("icd_to_hpo", node_icd_to_hpo)
-    graph.add_node("rollup", node_rollup)
     graph.add_node("patient_info", node_patient_info)
     graph.add_node("coverage", node_coverage)
     graph.add_node("fallback", node_fallback_text2cypher)
@@ -301,21 +285,11 @@ def build_graph() -> Any:
 
     # If no HPO found, fallback
     def have_hpo(state: AgentState) -> str:
-        return "rollup" if state.get("hpo_ids") else "fallback"
+        return "coverage" if state.get("hpo_ids") else "fallback"
 
     graph.add_conditional_edges(
         "icd_to_hpo",
         have_hpo,
-        {"rollup": "rollup", "fallback": "fallback"},
-    )
-
-    # If no targets after roll-up, fallback
-    def have_targets(state: AgentState) -> str:
-        return "coverage" if state.get("target_ids") else "fallback"
-
-    graph.add_conditional_edges(
-        "rollup",
-        have_targets,
         {"coverage": "coverage", "fallback": "fallback"},
     )
 
@@ -358,7 +332,6 @@ def run_agent(question: str, *, patient_id: Optional[str] = None) -> Dict[str, A
         "patient_id": final_state.get("patient_id"),
         "icd_codes": final_state.get("icd_codes"),
         "hpo_ids": final_state.get("hpo_ids"),
-        "target_ids": final_state.get("target_ids"),
         "results": final_state.get("results"),
         "final_answer": final_state.get("final_answer"),
     }
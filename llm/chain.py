@@ -1,11 +1,19 @@
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable
+
 from langchain_openai import ChatOpenAI
+from langchain_core.caches import InMemoryCache
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from llm.prompt import (
     ONTOLOGY_MAPPING_PROMPT,
     PATIENT_NER_PROMPT,
     PATIENT_NED_PROMPT,
+    PATIENT_NED_BATCH_PROMPT,
     GUARDRAILS_PROMPT,
     TEXT_2_CYPHER_PROMPT,
     QUERY_VALIDATION_PROMPT,
@@ -21,57 +29,124 @@ from llm.pydantic_model import (
     OntologyMappingResponse,
     PatientNERResponse,
     PatientNEDResponse,
+    PatientNEDBatchResponse,
     GuardrailsDecision,
     ValidateCypherOutput,
     DiagnoseCypherOutput,
     PatientCoverageResponse
 )
 
+##############################
+### Static prompt headers  ###
+##############################
+
+
+def _static_messages(prompt: dict) -> list:
+    """System message followed by the few-shot examples as user/assistant turns.
+
+    The header is byte-identical across calls; the last example is marked as a
+    cache breakpoint so providers with prompt caching only prefill the user block.
+    """
+    examples = prompt.get("examples", [])
+    msgs = [SystemMessage(content=prompt["system"])]
+    for i, ex in enumerate(examples):
+        msgs.append(HumanMessage(content=ex["user"]))
+        if i == len(examples) - 1:
+            msgs.append(AIMessage(content=[{
+                "type": "text",
+                "text": ex["assistant"],
+                "cache_control": {"type": "ephemeral"},
+            }]))
+        else:
+            msgs.append(AIMessage(content=ex["assistant"]))
+    return msgs
+
+
+def _with_user_template(static_msgs: list, user: str) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        *static_msgs,
+        HumanMessagePromptTemplate.from_template(user, template_format="jinja2"),
+    ])
+
+
+ONTOLOGY_MAPPING_STATIC_MSGS = _static_messages(ONTOLOGY_MAPPING_PROMPT)
+PATIENT_NER_STATIC_MSGS = _static_messages(PATIENT_NER_PROMPT)
+PATIENT_NED_STATIC_MSGS = _static_messages(PATIENT_NED_PROMPT)
+PATIENT_NED_BATCH_STATIC_MSGS = _static_messages(PATIENT_NED_BATCH_PROMPT)
+
+_ONTOLOGY_MAPPING_TEMPLATE = _with_user_template(ONTOLOGY_MAPPING_STATIC_MSGS, ONTOLOGY_MAPPING_PROMPT["user"])
+_PATIENT_NER_TEMPLATE = _with_user_template(PATIENT_NER_STATIC_MSGS, PATIENT_NER_PROMPT["user"])
+_PATIENT_NED_TEMPLATE = _with_user_template(PATIENT_NED_STATIC_MSGS, PATIENT_NED_PROMPT["user"])
+_PATIENT_NED_BATCH_TEMPLATE = _with_user_template(PATIENT_NED_BATCH_STATIC_MSGS, PATIENT_NED_BATCH_PROMPT["user"])
+
+
+##########################
+### LLM response cache ###
+##########################
+
+# Pass as ChatOpenAI(cache=LLM_RESPONSE_CACHE) to answer repeated prompts without
+# another provider call. Entries are keyed on the rendered prompt plus the model
+# parameters (model_name, temperature, ...), so only share it between
+# deterministic (temperature=0) models.
+LLM_RESPONSE_CACHE = InMemoryCache(maxsize=10_000)
+
+
+#########################
+### Chain memoization ###
+#########################
+
+
+def _cached_per_llm(build: Callable[[ChatOpenAI], Any], maxsize: int = 8):
+    """Build a chain once per LLM instance and reuse it on later calls.
+
+    Keyed on id(llm_model): a cached chain holds a reference to its LLM, so the
+    id cannot be recycled while the entry is alive.
+    """
+    chains: "OrderedDict[int, Any]" = OrderedDict()
+    lock = Lock()
+
+    @wraps(build)
+    def get_chain(llm_model: ChatOpenAI):
+        key = id(llm_model)
+        with lock:
+            chain = chains.get(key)
+            if chain is not None:
+                chains.move_to_end(key)
+                return chain
+        chain = build(llm_model)
+        with lock:
+            chains[key] = chain
+            chains.move_to_end(key)
+            while len(chains) > maxsize:
+                chains.popitem(last=False)
+        return chain
+
+    return get_chain
+
+
 #######################
 ### Building chains ###
 #######################
 
 
+@_cached_per_llm
 def ontology_mapping_chain(llm_model: ChatOpenAI):
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(
-            ONTOLOGY_MAPPING_PROMPT["system"],
-            template_format="jinja2",
-        ),
-        HumanMessagePromptTemplate.from_template(
-            ONTOLOGY_MAPPING_PROMPT["user"],
-            template_format="jinja2",
-        ),
-    ])
-    return prompt | llm_model.with_structured_output(OntologyMappingResponse)
+    return _ONTOLOGY_MAPPING_TEMPLATE | llm_model.with_structured_output(OntologyMappingResponse)
 
 
+@_cached_per_llm
 def patient_ner_chain(llm_model: ChatOpenAI):
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(
-            PATIENT_NER_PROMPT["system"],
-            template_format="jinja2",
-        ),
-        HumanMessagePromptTemplate.from_template(
-            PATIENT_NER_PROMPT["user"],
-            template_format="jinja2",
-        ),
-    ])
-    return prompt | llm_model.with_structured_output(PatientNERResponse)
+    return _PATIENT_NER_TEMPLATE | llm_model.with_structured_output(PatientNERResponse)
 
 
+@_cached_per_llm
 def patient_ned_chain(llm_model: ChatOpenAI):
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(
-            PATIENT_NED_PROMPT["system"],
-            template_format="jinja2",
-        ),
-        HumanMessagePromptTemplate.from_template(
-            PATIENT_NED_PROMPT["user"],
-            template_format="jinja2",
-        ),
-    ])
-    return prompt | llm_model.with_structured_output(PatientNEDResponse)
+    return _PATIENT_NED_TEMPLATE | llm_model.with_structured_output(PatientNEDResponse)
+
+
+@_cached_per_llm
+def patient_ned_batch_chain(llm_model: ChatOpenAI):
+    return _PATIENT_NED_BATCH_TEMPLATE | llm_model.with_structured_output(PatientNEDBatchResponse)
 
 
 ########################
@@ -79,6 +154,7 @@ def patient_ned_chain(llm_model: ChatOpenAI):
 ########################
 
 
+@_cached_per_llm
 def get_guardrails_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -91,6 +167,7 @@ def get_guardrails_chain(llm_model: ChatOpenAI):
     return prompt | llm_model.with_structured_output(GuardrailsDecision)
 
 
+@_cached_per_llm
 def text2cypher_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -105,6 +182,7 @@ def text2cypher_chain(llm_model: ChatOpenAI):
     return prompt | llm_model | StrOutputParser()
 
 
+@_cached_per_llm
 def validate_cypher_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -119,6 +197,7 @@ def validate_cypher_chain(llm_model: ChatOpenAI):
     return prompt | llm_model.with_structured_output(ValidateCypherOutput)
 
 
+@_cached_per_llm
 def diagnose_cypher_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -133,6 +212,7 @@ def diagnose_cypher_chain(llm_model: ChatOpenAI):
     return prompt | llm_model.with_structured_output(DiagnoseCypherOutput)
 
 
+@_cached_per_llm
 def correct_cypher_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -147,6 +227,7 @@ def correct_cypher_chain(llm_model: ChatOpenAI):
     return prompt | llm_model | StrOutputParser()
 
 
+@_cached_per_llm
 def clinician_explanation_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -161,6 +242,7 @@ def clinician_explanation_chain(llm_model: ChatOpenAI):
     return prompt | llm_model | StrOutputParser()
 
 
+@_cached_per_llm
 def get_patient_answer_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -175,6 +257,7 @@ def get_patient_answer_chain(llm_model: ChatOpenAI):
     return prompt | llm_model | StrOutputParser()
 
 
+@_cached_per_llm
 def patient_coverage_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -189,6 +272,7 @@ def patient_coverage_chain(llm_model: ChatOpenAI):
     return prompt | llm_model.with_structured_output(PatientCoverageResponse)
 
 
+@_cached_per_llm
 def get_final_answer_chain(llm_model: ChatOpenAI):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(
@@ -0,0 +1,42 @@
+from langchain_neo4j import Neo4jGraph
+from neo4j import AsyncDriver, AsyncGraphDatabase, Session
+
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "password"
+NEO4J_DATABASE = "cdl2025"
+
+# Sized for the tool worker pool: every query helper in llm/ shares this
+# driver instead of opening its own connection pool at import time.
+NEO4J_DRIVER_CONFIG = {
+    "max_connection_pool_size": 64,
+    "connection_acquisition_timeout": 30,
+    "max_connection_lifetime": 3600,
+}
+
+enhanced_graph = Neo4jGraph(
+    url=NEO4J_URI,
+    username=NEO4J_USER,
+    password=NEO4J_PASSWORD,
+    database=NEO4J_DATABASE,
+    enhanced_schema=True,
+    driver_config=NEO4J_DRIVER_CONFIG,
+)
+
+
+def graph_session(**kwargs) -> Session:
+    """Session on the pooled driver behind `enhanced_graph`."""
+    return enhanced_graph._driver.session(database=NEO4J_DATABASE, **kwargs)
+
+
+def new_async_driver() -> AsyncDriver:
+    """Async driver with the same settings as `enhanced_graph`.
+
+    Async connections belong to the event loop that opened them, so create one
+    per loop (e.g. inside `asyncio.run`) and close it when the loop is done.
+    """
+    return AsyncGraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        **NEO4J_DRIVER_CONFIG,
+    )
@@ -1,8 +1,9 @@
+import copy
 import re
+from functools import lru_cache
 from typing import List, Tuple, Any, Callable, Optional
 from langchain_openai import ChatOpenAI
 from neo4j.exceptions import CypherSyntaxError
-from langchain_neo4j import Neo4jGraph
 from langchain_neo4j.chains.graph_qa.cypher_utils import CypherQueryCorrector, Schema
 
 from llm.chain import (
@@ -12,18 +13,28 @@ from llm.chain import (
     correct_cypher_chain,
 )
 from llm.prompt import NEO4J_SCHEMA
+from llm.neo4j_client import enhanced_graph, graph_session
 
-enhanced_graph = Neo4jGraph(
-    url="bolt://localhost:7687",
-    username="neo4j",
-    password="password",
-    database="cdl2025",
-    enhanced_schema=True,
-)
 
-_relationships = enhanced_graph.structured_schema.get("relationships") or []
-corrector_schema = [Schema(el["start"], el["type"], el["end"]) for el in _relationships]
-cypher_query_corrector = CypherQueryCorrector(corrector_schema)
+def _build_corrector(schema: dict) -> CypherQueryCorrector:
+    relationships = schema.get("relationships") or []
+    return CypherQueryCorrector(
+        [Schema(el["start"], el["type"], el["end"]) for el in relationships]
+    )
+
+
+# Snapshot taken once at import; per-query code never touches the live schema.
+structured_schema = copy.deepcopy(enhanced_graph.structured_schema)
+cypher_query_corrector = _build_corrector(structured_schema)
+
+
+def refresh_schema() -> None:
+    """Re-read the graph schema, e.g. after an import, and rebuild the corrector."""
+    global structured_schema, cypher_query_corrector
+    enhanced_graph.refresh_schema()
+    structured_schema = copy.deepcopy(enhanced_graph.structured_schema)
+    cypher_query_corrector = _build_corrector(structured_schema)
+
 
 _CODE_FENCE_PATTERN = re.compile(
     r"```(?:cypher)?\s*(.*?)```", re.DOTALL | re.IGNORECASE
@@ -47,9 +58,122 @@ def try_explain(query: str) -> Tuple[bool, Optional[str]]:
         return False, e.message
 
 
+# Comments and backtick identifiers are matched only so they are skipped intact.
+_CYPHER_TOKEN_PATTERN = re.compile(
+    r"(?P<comment>//[^\n]*|/\*.*?\*/)"
+    r"|(?P<ident>`(?:[^`]|``)*`)"
+    r"|(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")",
+    re.DOTALL,
+)
+_CYPHER_ESCAPE_PATTERN = re.compile(r"\\(.)", re.DOTALL)
+_CYPHER_ESCAPES = {
+    "\\": "\\", "'": "'", '"': '"',
+    "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f",
+}
+
+
+@lru_cache(maxsize=1024)
+def _parameterize(query: str) -> Tuple[str, Tuple[str, ...]]:
+    values: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        literal = match.group("string")
+        if literal is None:
+            return match.group(0)
+        body = literal[1:-1]
+        escapes = _CYPHER_ESCAPE_PATTERN.findall(body)
+        if any(e not in _CYPHER_ESCAPES for e in escapes):
+            return literal  # e.g. \uXXXX: keep the literal as written
+        values.append(_CYPHER_ESCAPE_PATTERN.sub(lambda e: _CYPHER_ESCAPES[e.group(1)], body))
+        return f"$lit_{len(values) - 1}"
+
+    return _CYPHER_TOKEN_PATTERN.sub(replace, query), tuple(values)
+
+
+def parameterize_literals(query: str) -> Tuple[str, dict]:
+    """Replace string literals with `$lit_N` parameters.
+
+    Questions that differ only in their values then map to the same query text
+    and reuse Neo4j's cached plan. Numbers stay inline, since some positions
+    (e.g. variable-length bounds) do not accept parameters.
+    """
+    templated, values = _parameterize(query)
+    return templated, {f"lit_{i}": v for i, v in enumerate(values)}
+
+
+_LIMIT_PATTERN = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+_UNION_PATTERN = re.compile(r"\bUNION\b", re.IGNORECASE)
+_RETURN_PATTERN = re.compile(r"\bRETURN\b", re.IGNORECASE)
+
+
+def _ends_with_return(query: str) -> bool:
+    """Whether the last top-level clause of `query` is a RETURN.
+
+    A RETURN closing a subquery (`CALL { ... RETURN x }`, `COLLECT { ... }`) is
+    followed by an unmatched `}` and does not count.
+    """
+    code = _CYPHER_TOKEN_PATTERN.sub(" ", query)  # drop comments, identifiers, strings
+    returns = list(_RETURN_PATTERN.finditer(code))
+    if not returns:
+        return False
+    depth = 0
+    for ch in code[returns[-1].end():]:
+        if ch in "{([":
+            depth += 1
+        elif ch in "})]":
+            depth -= 1
+            if depth < 0:
+                return False
+    return True
+
+
+def _strip_statement_end(query: str) -> str:
+    """`query` without trailing whitespace, comments and semicolons."""
+    # blank comments in place so offsets in `code` still index into `query`
+    code = _CYPHER_TOKEN_PATTERN.sub(
+        lambda m: " " * len(m.group(0)) if m.group("comment") else m.group(0), query
+    )
+    return query[:len(code.rstrip().rstrip(";").rstrip())]
+
+
+def with_row_limit(query: str) -> str:
+    """Append `LIMIT $top_k` when the query ends in a RETURN without a LIMIT.
+
+    Anything else (standalone CALL/SHOW, UNION, queries that already limit) is
+    left alone; the caller's fetch size still caps the rows read.
+    """
+    if (
+        _LIMIT_PATTERN.search(query)
+        or _UNION_PATTERN.search(query)
+        or not _ends_with_return(query)
+    ):
+        return query
+    return f"{_strip_statement_end(query)}\nLIMIT $top_k"
+
+
+def fetch_rows(query: str, limit: Optional[int] = None) -> List[dict]:
+    """Run `query` and pull at most `limit` records from the server.
+
+    String literals are sent as parameters (see `parameterize_literals`).
+    Neo4j prunes rows via `LIMIT $top_k` when the query has no LIMIT of its
+    own; otherwise the session fetch size matches `limit`, so the driver PULLs
+    only that many records and DISCARDs the remainder when the session closes.
+    """
+    query, params = parameterize_literals(query)
+    if limit is None:
+        return enhanced_graph.query(query, params)
+    limit = max(int(limit), 0)
+    if limit == 0:
+        return []
+    with graph_session(fetch_size=limit) as session:
+        result = session.run(with_row_limit(query), {**params, "top_k": limit})
+        return [record.data() for record in result.fetch(limit)]
+
+
 def text2cypher_pipeline(
     llm: ChatOpenAI,
     question: str,
+    top_k: Optional[int] = None,
     debug: bool = False,
     debug_fn: Optional[Callable[[str], None]] = None,
 ) -> Tuple[str, List[dict]]:
@@ -179,7 +303,7 @@ def text2cypher_pipeline(
         log(corrected)
 
         try:
-            rows = enhanced_graph.query(corrected)
+            rows = fetch_rows(corrected, top_k)
         except Exception as e:
             # This catches runtime errors (e.g. bad property access) and returns "no answer"
             return no_answer(f"Execution error: {e}")
@@ -3,15 +3,7 @@ from datetime import datetime, date
 from datetime import date as DateType
 from typing import Any, Dict, Optional, List
 
-from langchain_neo4j import Neo4jGraph
-
-enhanced_graph = Neo4jGraph(
-    url="bolt://localhost:7687",
-    username="neo4j",
-    password="password",
-    database="cdl2025",
-    enhanced_schema=True,
-)
+from llm.neo4j_client import enhanced_graph
 
 
 def _parse_python_list_string(value: Optional[str]):
@@ -560,6 +560,151 @@ OTHER_MENTIONS:
 }
 
 
+PATIENT_NED_BATCH_PROMPT = {
+  "system": """
+You are an expert clinical entity linker for ICD codes.
+
+TASK
+Given:
+1) a numbered list of extracted mentions from the same encounter, each with metadata
+   and its own ranked list of ICD candidate codes (with scores and labels), and
+2) all extracted mentions from the same note (for collective disambiguation),
+choose the SINGLE best ICD code for EACH mention or abstain if none fits.
+
+OUTPUT
+Return STRICT JSON of the form {"entities": [...]} with EXACTLY one entry per input mention,
+in the SAME order as the input. Each entry preserves ALL original mention fields and appends:
+- "icd_id": string | null               // e.g., "F32.0"; null if abstaining
+- "icd_label": string | null            // the official title for icd_id; null if abstaining
+- "confidence": number                  // 0–1 calibrated confidence for your final choice
+- "linking_rationale": string           // ≤1 sentence, why this code matches the mention
+
+IMPORTANT RULES
+- Link every mention independently, choosing only among ITS OWN candidates.
+- Match the mention’s MEANING, not just wording; respect negation/temporality signals.
+- Prefer the most specific candidate that exactly fits the mention text span and context.
+- If the mention is clearly a symptom/sign (and no disorder-level diagnosis is stated),
+  prefer an R-chapter (symptoms) code over mood/disorder diagnoses, unless the mention
+  itself names a disorder (e.g., “major depressive episode”).
+- Use collective disambiguation: prefer candidates consistent with OTHER_MENTIONS
+  (ignore the mention itself when it also appears there).
+- Respect assertion:
+  • If the mention is negated (“assertion”: "negated"), abstain unless ICD coding
+    guidelines in your setting require coding negated conditions (default: abstain).
+  • If "uncertain", choose only if the ICD candidate reasonably covers suspected
+    conditions; otherwise abstain.
+- Do NOT invent codes not present in the mention's candidate list.
+- Break ties using (in order):
+  1) semantic fit to the exact span and its label,
+  2) clinical coherence with OTHER_MENTIONS,
+  3) candidate score,
+  4) greater specificity.
+- When no candidate is a good fit, return icd_id=null and state why in the rationale.
+- Keep each rationale concise (≤1 sentence).
+
+VALIDATION
+- The number and order of entries in "entities" must match the input mentions.
+- Ensure "icd_id" and "icd_label" are consistent (label must correspond to the id from candidates).
+- Confidence ∈ [0,1] and reflects your certainty in the final choice (not just the top candidate score).
+
+""",
+
+  "examples": [
+    {
+      "user": """
+MENTIONS:
+
+[0]
+MENTION:
+{"source": "narrative", "start": 8, "end": 16, "text": "low mood", "label": "Symptoms, signs and abnormal clinical and laboratory findings, not elsewhere classified", "assertion": "present", "temporality": "chronic", "rationale": "Symptom description rather than disorder."}
+
+CANDIDATES:
+[{"score": 0.759, "label": "Unhappiness", "id": "R45.2"}, {"score": 0.753, "label": "Depressive episode", "id": "F32"}, {"score": 0.744, "label": "Mild depressive episode", "id": "F32.0"}, {"score": 0.732, "label": "Demoralization and apathy", "id": "R45.3"}]
+
+[1]
+MENTION:
+{"source": "concat", "start": 61, "end": 82, "text": "Mild depressive episode", "label": "Mental and behavioural disorders", "assertion": "present", "temporality": "chronic", "rationale": "Explicit psychiatric diagnosis per criteria."}
+
+CANDIDATES:
+[{"score": 0.88, "label": "Mild depressive episode", "id": "F32.0"}, {"score": 0.80, "label": "Depressive episode", "id": "F32"}, {"score": 0.76, "label": "Moderate depressive episode", "id": "F32.1"}]
+
+[2]
+MENTION:
+{"source": "narrative", "start": 120, "end": 131, "text": "no pneumonia", "label": "Diseases of the respiratory system", "assertion": "negated", "temporality": "unspecified", "rationale": "Explicitly ruled out."}
+
+CANDIDATES:
+[{"score": 0.74, "label": "Pneumonia, unspecified organism", "id": "J18.9"}]
+
+OTHER_MENTIONS:
+[{"text": "low mood", "label": "Symptoms, signs and abnormal clinical and laboratory findings, not elsewhere classified"}, {"text": "Mild depressive episode", "label": "Mental and behavioural disorders"}, {"text": "no pneumonia", "label": "Diseases of the respiratory system"}]
+""",
+      "assistant": """
+{
+  "entities": [
+    {
+      "source": "narrative",
+      "start": 8,
+      "end": 16,
+      "text": "low mood",
+      "label": "Symptoms, signs and abnormal clinical and laboratory findings, not elsewhere classified",
+      "assertion": "present",
+      "temporality": "chronic",
+      "rationale": "Symptom description rather than disorder.",
+      "icd_id": "R45.2",
+      "icd_label": "Unhappiness",
+      "confidence": 0.83,
+      "linking_rationale": "The span denotes a symptom; R45.2 ‘Unhappiness’ best matches and is consistent with the symptom chapter label."
+    },
+    {
+      "source": "concat",
+      "start": 61,
+      "end": 82,
+      "text": "Mild depressive episode",
+      "label": "Mental and behavioural disorders",
+      "assertion": "present",
+      "temporality": "chronic",
+      "rationale": "Explicit psychiatric diagnosis per criteria.",
+      "icd_id": "F32.0",
+      "icd_label": "Mild depressive episode",
+      "confidence": 0.92,
+      "linking_rationale": "Exact textual and diagnostic match; most specific candidate consistent with context."
+    },
+    {
+      "source": "narrative",
+      "start": 120,
+      "end": 131,
+      "text": "no pneumonia",
+      "label": "Diseases of the respiratory system",
+      "assertion": "negated",
+      "temporality": "unspecified",
+      "rationale": "Explicitly ruled out.",
+      "icd_id": null,
+      "icd_label": null,
+      "confidence": 0.98,
+      "linking_rationale": "The mention is negated; abstaining from assigning a code."
+    }
+  ]
+}
+"""
+    }
+  ],
+
+  "user": """
+MENTIONS:
+{% for item in mentions %}
+[{{ loop.index0 }}]
+MENTION:
+{{ item.mention }}
+
+CANDIDATES:
+{{ item.candidates }}
+{% endfor %}
+OTHER_MENTIONS:
+{{ other_mentions }}
+"""
+}
+
+
 #############################################
 ### Prompts for Query Generation Pipeline ###
 #############################################
@@ -1047,7 +1192,8 @@ Tone: clear, clinically relevant, readable, and natural.
 
   "user": """
 You are given a schema description, a clinician's question, the final Cypher query,
-and the query results as JSON. Carefully inspect ALL keys and values.
+and the query results, either as CSV (one header row of keys, then one line per row)
+or as JSON. Carefully inspect ALL keys and values.
 
 Write exactly one section:
 
@@ -1069,7 +1215,7 @@ Clinician Question:
 Final Cypher Query:
 {{ cypher }}
 
-Query Results (JSON):
+Query Results:
 {{ rows_json }}
 """
 }
@@ -34,14 +34,17 @@ class PatientNERInput(BaseModel):
     concat_text: str
     narrative_text: str
 
+Assertion = Literal["present", "negated", "uncertain"]
+Temporality = Literal["acute", "chronic", "recurrent", "history", "unspecified"]
+
 class PatientNEREntity(BaseModel):
     source: str        # "concat" or "narrative"
     start: int         # 0-based [start, end)
     end: int
     text: str
     label: str         # must be one of icd_chapters
-    assertion: str     # "present" | "negated" | "uncertain"
-    temporality: str   # "acute" | "chronic" | "recurrent" | "history" | "unspecified"
+    assertion: Assertion
+    temporality: Temporality
     rationale: str
 
 class PatientNERResponse(BaseModel):
@@ -73,6 +76,17 @@ class PatientNEDResponse(PatientNEREntity):
     confidence: float = Field(default=None, ge=0.0, le=1.0)
     linking_rationale: str
 
+class PatientNEDBatchItem(BaseModel):
+    mention: PatientNEREntity
+    candidates: List[PatientNEDCandidate]
+
+class PatientNEDBatchInput(BaseModel):
+    mentions: List[PatientNEDBatchItem]
+    other_mentions: List[PatientNEDOtherMention] = Field(default_factory=list)
+
+class PatientNEDBatchResponse(BaseModel):
+    entities: List[PatientNEDResponse] = Field(default_factory=list)  # one per input mention, same order
+
 ####################
 ### Query Models ###
 ####################
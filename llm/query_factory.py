@@ -1,167 +1,308 @@
-import time
-from typing import List, Dict, Any, Optional, Set
-
-from langchain_neo4j import Neo4jGraph
-from neo4j.exceptions import ServiceUnavailable, SessionExpired
-
-
-enhanced_graph = Neo4jGraph(
-    url="bolt://localhost:7687",
-    username="neo4j",
-    password="password",
-    database="cdl2025",
-    enhanced_schema=True,
-)
-
-
-def _run_query(
-    cypher: str, params: Optional[Dict[str, Any]] = None, retries: int = 2
-):
-    """Run a Cypher query with minimal retry on transient errors."""
-    params = params or {}
-    attempt = 0
-    while True:
-        try:
-            return enhanced_graph.query(cypher, params)
-        except (ServiceUnavailable, SessionExpired):
-            if attempt >= retries:
-                raise
-            attempt += 1
-            time.sleep(0.5 * attempt)
-        except Exception:
-            raise
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import List, Dict, Any, Optional, Tuple
 
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from neo4j import AsyncDriver, ManagedTransaction, RoutingControl
 
-def get_patient_icd_codes(patient_id: str) -> List[str]:
-    """Fetch *all* ICD-10 codes for a patient across all rows.
+from llm.neo4j_client import NEO4J_DATABASE, graph_session, new_async_driver
 
-    Handles BOM-prefixed property names and returns a sorted list of
-    unique, uppercase, non-empty ICD-10 codes.
-    """
-    cypher = """
-    CALL apoc.dv.query('patient', {patientId: $pid}) YIELD node AS v
-    WITH apoc.convert.fromJsonList(
-           coalesce(
-               apoc.any.property(v, 'ICD10_Codes'),
-               apoc.any.property(v, '\uFEFFICD10_Codes')
-           )
-         ) AS codes
-    RETURN codes
+
+def _read_rows(tx: ManagedTransaction, cypher: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [r.data() for r in tx.run(cypher, params)]
+
+
+def _run_query(cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Run a read-only Cypher query in a managed read transaction.
+
+    The driver retries transient errors (ServiceUnavailable, SessionExpired, ...)
+    with backoff and routes the transaction to a reader.
     """
+    with graph_session() as session:
+        return session.execute_read(_read_rows, cypher, params or {})
+
+
+async def _run_query_async(
+    driver: AsyncDriver, cypher: str, params: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Async counterpart of `_run_query`; the driver retries transient errors."""
+    records, _, _ = await driver.execute_query(
+        cypher,
+        params or {},
+        database_=NEO4J_DATABASE,
+        routing_=RoutingControl.READ,
+    )
+    return [r.data() for r in records]
+
+
+########################
+### Cypher fragments ###
+########################
+
+# Each fragment consumes the variables produced by the previous one, so they can
+# be run standalone (with a parameter prologue) or stitched into one query.
+
+# pid -> one row per distinct, upper-cased, non-empty ICD code
+_PATIENT_ICD_FRAGMENT = """
+CALL apoc.dv.query('patient', {patientId: pid}) YIELD node AS v
+WITH apoc.convert.fromJsonList(
+       coalesce(
+           apoc.any.property(v, 'ICD10_Codes'),
+           apoc.any.property(v, '\uFEFFICD10_Codes')
+       )
+     ) AS codes
+UNWIND codes AS c
+WITH DISTINCT toUpper(trim(c)) AS code
+WHERE code <> ''
+"""
+
+# code -> one row per distinct mapped HPO phenotype h (direct or via UMLS).
+# One seek per code on the icd_unique_id constraint, then both mapping routes
+# are expanded from the same node.
+_ICD_TO_HPO_FRAGMENT = """
+MATCH (i:IcdDisease {id: code})  // uses :IcdDisease(id)
+UNWIND COLLECT {
+           MATCH (i)-[:ICD_MAPS_TO_HPO_PHENOTYPE]->(h:HpoPhenotype)
+           RETURN h
+       } + COLLECT {
+           MATCH (i)<-[:UMLS_TO_ICD]-(:UMLS)-[:UMLS_TO_HPO_PHENOTYPE]->(h:HpoPhenotype)
+           RETURN h
+       } AS h
+WITH DISTINCT h
+"""
+
+# h -> target: ancestors (including self) over :SUBCLASSOF*0..
+_ROLLUP_FRAGMENT = """
+MATCH (h)-[:SUBCLASSOF*0..]->(anc:HpoPhenotype)
+WITH collect(DISTINCT anc.id) AS target
+"""
+
+# target -> ranked coverage rows
+_COVERAGE_FRAGMENT = """
+// one phenotype_id index seek per target ID instead of testing every
+// disease phenotype against the target list
+UNWIND target AS tid
+MATCH (dh:HpoPhenotype {id: tid})<-[:HAS_PHENOTYPIC_FEATURE]-(d:HpoDisease)
+WITH d, collect(DISTINCT dh.id) AS got
+
+WITH d, got, size(got) AS covered
+ORDER BY covered DESC
+LIMIT $limit
+
+// got is already the overlap (got ⊆ existing). The full phenotype set is
+// pre-aggregated on the disease node by the HPO importer; graphs imported
+// before that step fall back to expanding the relationships. Either way it is
+// only built for the rows that survive the LIMIT.
+WITH d, got, covered,
+    coalesce(d.hpoIds, COLLECT {
+        MATCH (d)-[:HAS_PHENOTYPIC_FEATURE]->(x:HpoPhenotype)
+        RETURN DISTINCT x.id
+    }) AS existing
+
+RETURN d.id   AS diseaseId,
+    d.label AS diseaseName,
+    covered,
+    size(existing) AS total,
+    round(100.0 * covered / size(existing), 1) AS coveragePct,
+    [x IN existing WHERE NOT x IN got] AS missingHpoIds
+"""
+
+# patient -> ICD codes -> HPO phenotypes -> ancestors -> coverage, in one round-trip
+PATIENT_COVERAGE_QUERY = "\n".join([
+    "WITH $pid AS pid",
+    _PATIENT_ICD_FRAGMENT,
+    _ICD_TO_HPO_FRAGMENT,
+    _ROLLUP_FRAGMENT,
+    _COVERAGE_FRAGMENT,
+])
+
+# $pids -> the same ranking per patient; LIMIT applies inside each subquery
+COHORT_COVERAGE_QUERY = "\n".join([
+    "UNWIND $pids AS pid",
+    "CALL (pid) {",
+    _PATIENT_ICD_FRAGMENT,
+    _ICD_TO_HPO_FRAGMENT,
+    _ROLLUP_FRAGMENT,
+    _COVERAGE_FRAGMENT,
+    "}",
+    "RETURN pid, diseaseId, diseaseName, covered, total, coveragePct, missingHpoIds",
+])
+
+
+#####################
+### Result caches ###
+#####################
+
+# The lookups below are deterministic for a given graph state and are re-run by
+# every agent turn and patient_coverage call; entries expire after
+# QUERY_CACHE_TTL seconds so graph updates become visible without a restart.
+QUERY_CACHE_MAXSIZE = 4096
+QUERY_CACHE_TTL = 300
+
+_patient_icd_cache = TTLCache(maxsize=QUERY_CACHE_MAXSIZE, ttl=QUERY_CACHE_TTL)
+_icd_to_hpo_cache = TTLCache(maxsize=QUERY_CACHE_MAXSIZE, ttl=QUERY_CACHE_TTL)
+_patient_coverage_cache = TTLCache(maxsize=QUERY_CACHE_MAXSIZE, ttl=QUERY_CACHE_TTL)
+_patient_icd_lock = Lock()
+_icd_to_hpo_lock = Lock()
+_patient_coverage_lock = Lock()
+
+
+def _id_set_key(ids: List[str], /):
+    """Order-insensitive cache key for a list of IDs."""
+    return hashkey(tuple(sorted(ids)))
+
+
+def clear_query_caches() -> None:
+    """Drop all cached lookups, e.g. after re-importing ontologies or patients."""
+    for cache, lock in (
+        (_patient_icd_cache, _patient_icd_lock),
+        (_icd_to_hpo_cache, _icd_to_hpo_lock),
+        (_patient_coverage_cache, _patient_coverage_lock),
+    ):
+        with lock:
+            cache.clear()
+
+
+# The cached lookups take their arguments positionally (one cache entry per
+# value, however the public helper was called); the public helpers return fresh
+# copies, so callers never share a mutable cached object.
+
+@cached(_patient_icd_cache, lock=_patient_icd_lock)
+def _patient_icd_codes(patient_id: str, /) -> Tuple[str, ...]:
+    cypher = "\n".join([
+        "WITH $pid AS pid",
+        _PATIENT_ICD_FRAGMENT,
+        "RETURN apoc.coll.sort(collect(code)) AS codes",
+    ])
 
     rows = _run_query(cypher, {"pid": patient_id})
-    if not rows:
-        return []
+    return tuple(rows[0]["codes"]) if rows else ()
 
-    all_codes: Set[str] = set()
-    for row in rows:
-        row_codes = row.get("codes") or []
-        for c in row_codes:
-            cleaned = (c or "").strip().upper()
-            if cleaned:
-                all_codes.add(cleaned)
 
-    return sorted(all_codes)
+@cached(_icd_to_hpo_cache, key=_id_set_key, lock=_icd_to_hpo_lock)
+def _icd_to_hpo(icd_codes: List[str], /) -> Tuple[str, ...]:
+    cypher = "\n".join([
+        "UNWIND $codes AS code",
+        _ICD_TO_HPO_FRAGMENT,
+        "RETURN collect(h.id) AS hpo_ids",
+    ])
+
+    rows = _run_query(cypher, {"codes": list(icd_codes)})
+    return tuple(rows[0].get("hpo_ids", [])) if rows else ()
+
+
+@cached(_patient_coverage_cache, lock=_patient_coverage_lock)
+def _patient_coverage(patient_id: str, limit: int, /) -> List[Dict[str, Any]]:
+    return _run_query(PATIENT_COVERAGE_QUERY, {"pid": patient_id, "limit": limit})
+
+
+def get_patient_icd_codes(patient_id: str) -> List[str]:
+    """Fetch *all* ICD-10 codes for a patient across all rows.
+
+    Handles BOM-prefixed property names and returns a sorted list of
+    unique, uppercase, non-empty ICD-10 codes. Cleanup and dedup run in Cypher.
+    """
+    return list(_patient_icd_codes(patient_id))
 
 
 def map_icd_to_hpo(icd_codes: List[str]) -> List[str]:
     """Map ICD codes to HPO phenotype IDs."""
     if not icd_codes:
         return []
-
-    cypher = """
-    CALL {
-        UNWIND $codes AS code
-        MATCH (:IcdDisease {id: code})-[:ICD_MAPS_TO_HPO_PHENOTYPE]->(h:HpoPhenotype)
-        RETURN DISTINCT h.id AS hpo_id
-        
-        UNION
-        
-        UNWIND $codes AS code
-        MATCH (:IcdDisease {id: code})<-[:UMLS_TO_ICD]-(:UMLS)-[:UMLS_TO_HPO_PHENOTYPE]->(h:HpoPhenotype)
-        RETURN DISTINCT h.id AS hpo_id
-    }
-    RETURN collect(DISTINCT hpo_id) AS hpo_ids;
-    """
-
-    rows = _run_query(cypher, {"codes": icd_codes})
-    return rows[0].get("hpo_ids", []) if rows else []
+    return list(_icd_to_hpo(icd_codes))
 
 
-def rollup_hpo_to_ancestors(hpo_ids: List[str]) -> List[str]:
-    """Roll up to ancestors (including self) over :SUBCLASSOF*0.. and return unique IDs."""
+def compute_coverage_from_hpo(hpo_ids: List[str], limit: int = 20) -> List[Dict[str, Any]]:
+    """Roll up HPO IDs to their ancestors and compute coverage in one round-trip."""
     if not hpo_ids:
         return []
 
-    cypher = """
-    UNWIND $ids AS hid
-    MATCH (h:HpoPhenotype {id: hid})-[:SUBCLASSOF*0..]->(anc:HpoPhenotype)
-    WITH collect(DISTINCT anc.id) AS target
-    RETURN [id IN apoc.coll.toSet(target) WHERE id IS NOT NULL] AS target
-    """
+    cypher = "\n".join([
+        "UNWIND $hpo_ids AS hid",
+        "MATCH (h:HpoPhenotype {id: hid})",
+        _ROLLUP_FRAGMENT,
+        _COVERAGE_FRAGMENT,
+    ])
 
-    rows = _run_query(cypher, {"ids": hpo_ids})
-    return rows[0].get("target", []) if rows else []
+    return _run_query(cypher, {"hpo_ids": hpo_ids, "limit": int(limit)})
 
 
-def compute_coverage(target_ids: List[str], limit: int = 20) -> List[Dict[str, Any]]:
-    """Given rolled-up HPO target IDs, compute coverage across diseases."""
-    if not target_ids:
-        return []
+def rank_diseases_for_patient(
+    patient_id: str,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """End-to-end pipeline in a single Cypher round-trip:
+    patient -> ICD codes -> HPO phenotypes -> ancestors -> coverage.
 
-    cypher = """
-    MATCH (d:HpoDisease)-[:HAS_PHENOTYPIC_FEATURE]->(dh:HpoPhenotype)
-    WHERE dh.id IN $target
-    WITH d, collect(DISTINCT dh.id) AS got
-
-    MATCH (d)-[:HAS_PHENOTYPIC_FEATURE]->(all_dh:HpoPhenotype)
-    WITH d,
-        apoc.coll.toSet(collect(DISTINCT all_dh.id)) AS existing,
-        apoc.coll.toSet(got)                         AS got
-
-    WITH d, existing,
-        apoc.coll.intersection(existing, got) AS overlap,
-        apoc.coll.subtract(existing, got)     AS missing,
-        got
-
-    WITH d, size(overlap) AS covered,
-        size(existing)   AS total,
-        missing
-
-    RETURN d.id   AS diseaseId,
-        d.label AS diseaseName,
-        covered,
-        total,
-        round(100.0 * covered / total, 1) AS coveragePct,
-        missing AS missingHpoIds
-    ORDER BY covered DESC
-    LIMIT $limit;
+    Results are cached per (patient_id, limit) for QUERY_CACHE_TTL seconds.
     """
+    return copy.deepcopy(_patient_coverage(patient_id, int(limit)))
 
-    return _run_query(cypher, {"target": target_ids, "limit": int(limit)})
 
-
-def rank_diseases_for_patient(
+async def rank_diseases_for_patient_async(
+    driver: AsyncDriver,
     patient_id: str,
     limit: int = 20,
 ) -> List[Dict[str, Any]]:
-    """End-to-end pipeline using the canonical helper functions:
-    patient -> ICD codes -> HPO phenotypes -> ancestors -> coverage.
+    """Async `rank_diseases_for_patient` on a caller-owned async driver."""
+    return await _run_query_async(
+        driver, PATIENT_COVERAGE_QUERY, {"pid": patient_id, "limit": int(limit)}
+    )
+
+
+async def rank_diseases_for_patients_async(
+    patient_ids: List[str],
+    limit: int = 20,
+    driver: Optional[AsyncDriver] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Rank diseases for several patients with overlapping round-trips.
+
+    Pass a long-lived `driver` to reuse its connection pool across calls;
+    otherwise a driver is opened and closed around this call.
     """
-    # 1) ICD codes from DV
-    icd_codes = get_patient_icd_codes(patient_id)
-    if not icd_codes:
-        return []
+    if driver is None:
+        async with new_async_driver() as owned:
+            return await rank_diseases_for_patients_async(patient_ids, limit, driver=owned)
 
-    # 2) ICD -> HPO
-    hpo_ids = map_icd_to_hpo(icd_codes)
-    if not hpo_ids:
-        return []
+    results = await asyncio.gather(*[
+        rank_diseases_for_patient_async(driver, pid, limit=limit)
+        for pid in patient_ids
+    ])
+    return dict(zip(patient_ids, results))
 
-    # 3) Roll up to ancestors
-    target_ids = rollup_hpo_to_ancestors(hpo_ids)
-    if not target_ids:
-        return []
 
-    # 4) Compute coverage
-    return compute_coverage(target_ids, limit=limit)
+def rank_diseases_for_cohort(
+    patient_ids: List[str],
+    limit: int = 20,
+    chunk_size: int = 50,
+    max_workers: int = 8,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Rank diseases for several patients, one Cypher round-trip per chunk.
+
+    Chunks of `chunk_size` patients run concurrently on up to `max_workers`
+    sessions of the shared driver. Returns `{patient_id: rows}`; patients
+    without mapped phenotypes get `[]`.
+    """
+    pids = list(dict.fromkeys(patient_ids))
+    ranked: Dict[str, List[Dict[str, Any]]] = {pid: [] for pid in pids}
+    if not pids:
+        return ranked
+
+    chunks = [pids[i:i + chunk_size] for i in range(0, len(pids), chunk_size)]
+
+    def run(chunk: List[str]) -> List[Dict[str, Any]]:
+        return _run_query(COHORT_COVERAGE_QUERY, {"pids": chunk, "limit": int(limit)})
+
+    if len(chunks) == 1:
+        results = [run(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            results = list(pool.map(run, chunks))
+
+    for rows in results:
+        for row in rows:
+            ranked[row.pop("pid")].append(row)
+    return ranked
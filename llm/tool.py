@@ -1,9 +1,14 @@
+import csv
 from datetime import date
+import io
 import json
+import logging
+import orjson
+import re
 from typing import List, Optional
 
 from langchain_core.tools import tool
-from langchain_neo4j import Neo4jGraph
+from pydantic import TypeAdapter, ValidationError
 from langchain_openai import ChatOpenAI
 
 from llm.prompt import NEO4J_SCHEMA
@@ -16,6 +21,8 @@ from llm.pydantic_model import (
     PatientNEDInput,
     PatientNEDCandidate,
     PatientNEDOtherMention,
+    PatientNEDBatchItem,
+    PatientNEDBatchInput,
     GeneralMedicalInput,
     GeneralMedicalResponse,
     CoverageRow,
@@ -25,14 +32,45 @@ from llm.chain import (
     ontology_mapping_chain,
     patient_ner_chain,
     patient_ned_chain,
+    patient_ned_batch_chain,
     clinician_explanation_chain,
     get_patient_answer_chain,
     patient_coverage_chain,
 )
 
-from llm.pipeline import text2cypher_pipeline, enhanced_graph
+from llm.pipeline import text2cypher_pipeline
 from llm.pipeline_patient import get_patient_views
-from llm.query_factory import rank_diseases_for_patient
+from llm.query_factory import PATIENT_COVERAGE_QUERY, rank_diseases_for_patient
+
+
+# NED payloads are rendered to compact JSON straight from pydantic-core; field
+# order is fixed by the models, so identical inputs give byte-identical prompts.
+_MENTION_ADAPTER = TypeAdapter(PatientNEREntity)
+_CANDIDATES_ADAPTER = TypeAdapter(List[PatientNEDCandidate])
+_OTHER_MENTIONS_ADAPTER = TypeAdapter(List[PatientNEDOtherMention])
+_COVERAGE_ROWS_ADAPTER = TypeAdapter(List[CoverageRow])
+
+_CSV_SCALARS = (str, int, float, bool, type(None))
+
+
+def _render_rows(rows: List[dict]) -> str:
+    """Compact prompt rendering of query rows.
+
+    Rows that share the same scalar columns become CSV, so each key is written
+    once instead of once per row; nested or ragged results stay JSON.
+    """
+    if rows and all(isinstance(r, dict) for r in rows):
+        columns = list(rows[0])
+        if all(
+            list(r) == columns and all(isinstance(v, _CSV_SCALARS) for v in r.values())
+            for r in rows
+        ):
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(r.values() for r in rows)
+            return buf.getvalue()
+    return orjson.dumps(rows, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
 
 
 def build_ontology_mapper_tool(llm):
@@ -90,15 +128,39 @@ def build_patient_ned_tool(llm):
     ):
         """Disambiguate a medical mention to the best ICD code candidate and return a structured result."""
         result = chain.invoke({
-            "mention": mention,
-            "candidates": candidates,
-            "other_mentions": other_mentions,
+            "mention": _MENTION_ADAPTER.dump_json(mention).decode(),
+            "candidates": _CANDIDATES_ADAPTER.dump_json(candidates).decode(),
+            "other_mentions": _OTHER_MENTIONS_ADAPTER.dump_json(other_mentions).decode(),
         })
         return result.model_dump()
 
     return patient_ned_tool
 
 
+def build_patient_ned_batch_tool(llm):
+    chain = patient_ned_batch_chain(llm)
+
+    @tool("patient_ned_batch", args_schema=PatientNEDBatchInput)
+    def patient_ned_batch_tool(
+        mentions: list[PatientNEDBatchItem],
+        other_mentions: list[PatientNEDOtherMention] = [],
+    ):
+        """Disambiguate all mentions of an encounter in a single call and return one structured result per mention."""
+        result = chain.invoke({
+            "mentions": [
+                {
+                    "mention": _MENTION_ADAPTER.dump_json(item.mention).decode(),
+                    "candidates": _CANDIDATES_ADAPTER.dump_json(item.candidates).decode(),
+                }
+                for item in mentions
+            ],
+            "other_mentions": _OTHER_MENTIONS_ADAPTER.dump_json(other_mentions).decode(),
+        })
+        return result.model_dump()
+
+    return patient_ned_batch_tool
+
+
 def build_general_medical_tool(llm: ChatOpenAI, debug: bool = False):
     explanation_chain = clinician_explanation_chain(llm)
 
@@ -109,16 +171,13 @@ def build_general_medical_tool(llm: ChatOpenAI, debug: bool = False):
     ):
         """
         Run a general medical query against the Neo4j knowledge graph, converting
-        the question to Cypher, truncating results to top_k, and returning rows
+        the question to Cypher, fetching at most top_k rows, and returning rows
         along with an LLM-generated explanation.
         """
-        cypher, rows = text2cypher_pipeline(llm, question, debug=debug)
-
-        if isinstance(rows, list) and top_k is not None:
-            rows = rows[: int(top_k)]
+        cypher, rows = text2cypher_pipeline(llm, question, top_k=top_k, debug=debug)
 
-        # Prepare JSON for the prompt
-        rows_json = json.dumps(rows, default=str)
+        # CSV for flat tabular results, JSON otherwise
+        rows_json = _render_rows(rows)
 
         try:
             explanation = explanation_chain.invoke(
@@ -142,11 +201,6 @@ def build_general_medical_tool(llm: ChatOpenAI, debug: bool = False):
     return general_medical_executor
 
 
-import json
-import re
-from typing import Optional
-from langchain_core.tools import tool
-
 def build_patient_info_tool(llm: ChatOpenAI):
     explain_chain = get_patient_answer_chain(llm)
 
@@ -220,32 +274,27 @@ def build_patient_coverage_tool(llm: ChatOpenAI):
         limit: int = 20,
     ):
         """
-        Deterministic single-patient coverage using the canonical Python pipeline:
-        get_patient_icd_codes -> map_icd_to_hpo -> rollup_hpo_to_ancestors -> compute_coverage
+        Deterministic single-patient coverage using one stitched Cypher query:
+        patient ICD codes -> HPO phenotypes -> ancestor roll-up -> disease coverage
         """
         # Still run the LLM chain for traceability / audit logs
         _ = chain.invoke({"patient_id": patient_id, "limit": int(limit)})
 
-        # Use the new implementation instead of stitched Cypher
         rows = rank_diseases_for_patient(patient_id=patient_id, limit=int(limit))
 
-        # Cast rows into CoverageRow when possible
-        cast_rows: List[CoverageRow] = []
-        for r in rows or []:
-            try:
-                cast_rows.append(CoverageRow(**r))
-            except Exception:
-                # If casting fails, just skip and fall back to raw dicts
-                pass
-
-        response_rows = cast_rows or rows
+        # Cast all rows into CoverageRow in one pydantic-core pass; rows are
+        # always CoverageRow, so a malformed result set yields no rows
+        try:
+            response_rows = _COVERAGE_ROWS_ADAPTER.validate_python(rows or [])
+        except ValidationError as e:
+            logging.warning(
+                "patient_coverage: dropping %d row(s) for patient %s that failed CoverageRow validation: %s",
+                len(rows or []), patient_id, e,
+            )
+            response_rows = []
 
         return PatientCoverageResponse(
-            cypher=(
-                "MULTI-STEP PIPELINE: "
-                "get_patient_icd_codes -> map_icd_to_hpo -> "
-                "rollup_hpo_to_ancestors -> compute_coverage"
-            ),
+            cypher=PATIENT_COVERAGE_QUERY,
             rows=response_rows,
             steps=[
                 "patient_icd",
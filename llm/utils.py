@@ -1,23 +1,131 @@
+import asyncio
+import random
+from array import array
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from cachetools import LRUCache
 from util.api_client import ApiClient
-from typing import List, Sequence
+from util.async_api_client import AsyncApiClient
+from typing import Dict, List, Optional, Sequence
 
 class EmbedAPI:
     """Thin client around an embedding endpoint exposed by ApiClient."""
 
-    def __init__(self, api: ApiClient):
+    def __init__(
+        self,
+        api: ApiClient,
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+        jitter_ms: float = 50.0,
+        cache_size: int = 100_000,
+    ):
         self.api = api
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.jitter_ms = jitter_ms
+        # text -> float32 vector; labels and mentions recur across patients and runs.
+        # array("f") takes 4 bytes per dimension versus ~32 for a list of floats.
+        self._cache = LRUCache(maxsize=cache_size) if cache_size > 0 else None
+        self._cache_lock = Lock()
 
     def embed(self, text: str) -> List[float]:
         """Return a single embedding vector."""
-        resp = self.api.post("/embed", {"input": [text]})
-        return resp[0]["data"][0]
+        return self.embed_many([text])[0]
+
+    def _embed_chunk(self, chunk: List[str]) -> List[Sequence[float]]:
+        resp = self.api.post("/embed", {"input": chunk})
+        data = resp[0]["data"]
+        if len(data) != len(chunk):
+            raise RuntimeError(f"Embedding count mismatch ({len(data)} != {len(chunk)})")
+        return data
 
     def embed_many(self, texts: List[str]) -> List[Sequence[float]]:
+        """Return one vector per input text; preserve order.
+
+        Cached texts are served locally; the remaining texts are posted once
+        each, however often they repeat in `texts`.
+        """
+        vectors: List[Optional[Sequence[float]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}  # text -> positions in `texts`
+        with self._cache_lock:
+            for i, text in enumerate(texts):
+                packed = self._cache.get(text) if self._cache is not None else None
+                if packed is None:
+                    pending.setdefault(text, []).append(i)
+                else:
+                    vectors[i] = packed.tolist()
+
+        if pending:
+            fetched = self._post_many(list(pending))
+            with self._cache_lock:
+                for (text, positions), vector in zip(pending.items(), fetched):
+                    for i in positions:
+                        vectors[i] = vector
+                    if self._cache is not None:
+                        self._cache[text] = array("f", vector)
+        return vectors
+
+    def _post_many(self, texts: List[str]) -> List[Sequence[float]]:
+        """Embed `texts` over HTTP, preserving order.
+
+        Texts are sent in windows of `batch_size`; up to `max_in_flight` windows
+        are posted concurrently, each after a random delay of up to `jitter_ms`.
+        """
+        vectors: List[Optional[Sequence[float]]] = [None] * len(texts)
+        chunks = [
+            (start, texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+
+        if len(chunks) <= 1 or self.max_in_flight <= 1:
+            for start, chunk in chunks:
+                vectors[start:start + len(chunk)] = self._embed_chunk(chunk)
+            return vectors
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(chunks))) as pool:
+            futures = {}
+            for start, chunk in chunks:
+                if self.jitter_ms > 0:
+                    time.sleep(random.uniform(0, self.jitter_ms) / 1000)
+                futures[pool.submit(self._embed_chunk, chunk)] = start
+            for future in as_completed(futures):
+                data = future.result()
+                start = futures[future]
+                vectors[start:start + len(data)] = data
+        return vectors
+
+
+class AsyncEmbedAPI:
+    """Async EmbedAPI on an AsyncApiClient; same batching and ordering."""
+
+    def __init__(
+        self,
+        api: AsyncApiClient,
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+    ):
+        self.api = api
+        self.batch_size = batch_size
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def aembed(self, text: str) -> List[float]:
+        """Return a single embedding vector."""
+        return (await self.aembed_many([text]))[0]
+
+    async def _aembed_chunk(self, chunk: List[str]) -> List[Sequence[float]]:
+        async with self._in_flight:
+            resp = await self.api.post("/embed", {"input": chunk})
+        data = resp[0]["data"]
+        if len(data) != len(chunk):
+            raise RuntimeError(f"Embedding count mismatch ({len(data)} != {len(chunk)})")
+        return data
+
+    async def aembed_many(self, texts: List[str]) -> List[Sequence[float]]:
         """Return one vector per input text; preserve order."""
-        if not texts:
-            return []
-        resp = self.api.post("/embed", {"input": texts})
-        vectors = resp[0]["data"]
-        if len(vectors) != len(texts):
-            raise RuntimeError(f"Embedding count mismatch ({len(vectors)} != {len(texts)})")
-        return vectors
\ No newline at end of file
+        chunks = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        results = await asyncio.gather(*[self._aembed_chunk(c) for c in chunks])
+        return [vector for data in results for vector in data]
@@ -1,7 +1,42 @@
 from __future__ import annotations
-import json, urllib.request, urllib.parse
+import gzip
+import urllib.parse
 from typing import Any, Dict
 
+import orjson
+import urllib3
+from urllib3.util import Retry, Timeout
+
+# Retry and timeout policy shared with util.async_api_client.AsyncApiClient.
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 60.0
+
+# Shared keep-alive pool: sockets (and TLS sessions) are reused across calls
+# instead of opening a new connection per request. Each request (e.g. one
+# embedding batch) is retried on its own, honouring Retry-After on 429/503;
+# once retries run out the last response is returned and reported as an HTTP error.
+# Only connection errors and the listed statuses are retried: a read timeout
+# already waited the full read_timeout, so it surfaces instead of repeating.
+_POOL = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=16,
+    retries=Retry(
+        total=RETRY_TOTAL,
+        read=0,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # POST /embed is safe to repeat
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+)
+
+# Request bodies at least this large are gzipped when compression is enabled.
+GZIP_MIN_BYTES = 8192
+
 def build_url(base_url: str, path: str, query: dict | None = None) -> str:
     """
     Join base_url with path and optional query dict.
@@ -17,10 +52,16 @@ def request(
     url: str,
     json_body: dict | None = None,
     headers: dict | None = None,
-    timeout: int = 10,
+    timeout: float | Timeout = 10,
+    pool: urllib3.PoolManager | None = None,
+    gzip_body: bool = False,
 ) -> tuple[Any, int, Dict[str, str]]:
     """
-    Minimal HTTP client using urllib.
+    Minimal HTTP client on a pooled urllib3.PoolManager.
+
+    Responses are requested gzip/deflate-encoded and decoded transparently.
+    With gzip_body=True, JSON bodies of GZIP_MIN_BYTES or more are sent
+    gzip-compressed; only enable it for servers that accept Content-Encoding.
 
     Returns: (body, status_code, headers)
       - body is JSON-decoded (dict/list) if Content-Type is application/json,
@@ -29,43 +70,63 @@ def request(
       - RuntimeError on HTTP/connection errors with readable details.
     """
     method = method.upper()
-    hdrs = {"Accept": "application/json"}
+    hdrs = {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
     data = None
 
     if json_body is not None:
-        data = json.dumps(json_body).encode("utf-8")
+        data = orjson.dumps(json_body)
         hdrs["Content-Type"] = "application/json"
+        if gzip_body and len(data) >= GZIP_MIN_BYTES:
+            data = gzip.compress(data, compresslevel=5)
+            hdrs["Content-Encoding"] = "gzip"
 
     if headers:
         hdrs.update(headers)
 
-    req = urllib.request.Request(url=url, data=data, headers=hdrs, method=method)
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body_bytes = resp.read()
-            ctype = resp.headers.get("Content-Type", "")
-            if "application/json" in ctype:
-                body = json.loads(body_bytes.decode("utf-8"))
-            else:
-                body = body_bytes.decode("utf-8")
-            return body, resp.status, dict(resp.headers)
-    except urllib.error.HTTPError as e:
-        detail = e.read().decode("utf-8", errors="ignore")
-        raise RuntimeError(f"HTTP {e.code} {e.reason}: {detail}") from None
-    except urllib.error.URLError as e:
+        resp = (pool or _POOL).request(method, url, body=data, headers=hdrs, timeout=timeout)
+    except urllib3.exceptions.MaxRetryError as e:
         raise RuntimeError(f"Connection error: {e.reason}") from None
+    except urllib3.exceptions.HTTPError as e:
+        raise RuntimeError(f"Connection error: {e}") from None
+
+    body_bytes = resp.data
+    if resp.status >= 400:
+        detail = body_bytes.decode("utf-8", errors="ignore")
+        raise RuntimeError(f"HTTP {resp.status} {resp.reason}: {detail}")
+
+    ctype = resp.headers.get("Content-Type", "")
+    if "application/json" in ctype:
+        body = orjson.loads(body_bytes)
+    else:
+        body = body_bytes.decode("utf-8")
+    return body, resp.status, dict(resp.headers)
 
 class ApiClient:
     """
     Tiny convenience wrapper around request() with a base URL
 
+    connect_timeout bounds the TCP/TLS handshake; read_timeout bounds each wait
+    for response bytes and is sized for large embedding batches. A per-call
+    `timeout` overrides both.
+
     Example:
         api = ApiClient("http://127.0.0.1:8000")
         body, status, _ = api.get("/health")
     """
-    def __init__(self, base_url: str, auth_token: str | None = None):
+    def __init__(
+        self,
+        base_url: str,
+        auth_token: str | None = None,
+        gzip_requests: bool = False,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+    ):
         self.base_url = base_url.rstrip("/")
         self.auth_headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+        self.pool = _POOL
+        self.gzip_requests = gzip_requests
+        self.timeout = Timeout(connect=connect_timeout, read=read_timeout)
 
     def _url(self, path: str, query: dict | None = None) -> str:
         return build_url(self.base_url, path, query)
@@ -75,44 +136,50 @@ class ApiClient:
         path: str,
         query: dict | None = None,
         headers: dict | None = None,
-        timeout: int = 10,
+        timeout: float | Timeout | None = None,
     ) -> tuple[Any, int, Dict[str, str]]:
         hdrs = dict(self.auth_headers)
         if headers:
             hdrs.update(headers)
-        return request("GET", self._url(path, query), headers=hdrs, timeout=timeout)
+        return request("GET", self._url(path, query), headers=hdrs, timeout=timeout or self.timeout, pool=self.pool)
 
     def post(
         self,
         path: str,
         json_body: dict | None = None,
         headers: dict | None = None,
-        timeout: int = 10,
+        timeout: float | Timeout | None = None,
     ) -> tuple[Any, int, Dict[str, str]]:
         hdrs = dict(self.auth_headers)
         if headers:
             hdrs.update(headers)
-        return request("POST", self._url(path), json_body=json_body, headers=hdrs, timeout=timeout)
+        return request(
+            "POST", self._url(path), json_body=json_body, headers=hdrs, timeout=timeout or self.timeout,
+            pool=self.pool, gzip_body=self.gzip_requests,
+        )
 
     def put(
         self,
         path: str,
         json_body: dict | None = None,
         headers: dict | None = None,
-        timeout: int = 10,
+        timeout: float | Timeout | None = None,
     ) -> tuple[Any, int, Dict[str, str]]:
         hdrs = dict(self.auth_headers)
         if headers:
             hdrs.update(headers)
-        return request("PUT", self._url(path), json_body=json_body, headers=hdrs, timeout=timeout)
+        return request(
+            "PUT", self._url(path), json_body=json_body, headers=hdrs, timeout=timeout or self.timeout,
+            pool=self.pool, gzip_body=self.gzip_requests,
+        )
 
     def delete(
         self,
         path: str,
         headers: dict | None = None,
-        timeout: int = 10,
+        timeout: float | Timeout | None = None,
     ) -> tuple[Any, int, Dict[str, str]]:
         hdrs = dict(self.auth_headers)
         if headers:
             hdrs.update(headers)
-        return request("DELETE", self._url(path), headers=hdrs, timeout=timeout)
+        return request("DELETE", self._url(path), headers=hdrs, timeout=timeout or self.timeout, pool=self.pool)
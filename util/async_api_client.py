@@ -0,0 +1,148 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, Dict
+
+import httpx
+import orjson
+
+from util.api_client import (
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    RETRY_BACKOFF,
+    RETRY_STATUSES,
+    RETRY_TOTAL,
+    build_url,
+)
+
+def _retry_delay(resp: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying `resp`: Retry-After if given, else backoff."""
+    retry_after = resp.headers.get("Retry-After", "").strip()
+    if retry_after.isdigit():
+        return float(retry_after)
+    return RETRY_BACKOFF * (2 ** attempt)
+
+class AsyncApiClient:
+    """
+    Async counterpart of ApiClient on a long-lived httpx.AsyncClient.
+
+    Connections are pooled and reused across calls; close the client with
+    `await api.aclose()` or use it as an async context manager. Timeouts and
+    retries follow ApiClient: connection errors and RETRY_STATUSES responses
+    are retried up to RETRY_TOTAL times (honouring Retry-After), read timeouts
+    are not.
+
+    Example:
+        async with AsyncApiClient("http://127.0.0.1:8000") as api:
+            body, status, _ = await api.get("/health")
+    """
+    def __init__(
+        self,
+        base_url: str,
+        auth_token: str | None = None,
+        max_keepalive_connections: int = 32,
+        http2: bool = False,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.auth_headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        # http2=True needs the optional `h2` package (pip install "httpx[http2]")
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(max_keepalive_connections=max_keepalive_connections),
+            retries=RETRY_TOTAL,  # connection errors only
+        )
+        self._client = httpx.AsyncClient(transport=transport)
+
+    async def __aenter__(self) -> "AsyncApiClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _url(self, path: str, query: dict | None = None) -> str:
+        return build_url(self.base_url, path, query)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        json_body: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | httpx.Timeout | None = None,
+    ) -> tuple[Any, int, Dict[str, str]]:
+        """
+        Same contract as util.api_client.request().
+
+        Returns: (body, status_code, headers)
+        Raises:
+          - RuntimeError on HTTP/connection errors with readable details.
+        """
+        hdrs = {"Accept": "application/json", **self.auth_headers}
+        data = None
+
+        if json_body is not None:
+            data = orjson.dumps(json_body)
+            hdrs["Content-Type"] = "application/json"
+
+        if headers:
+            hdrs.update(headers)
+
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                resp = await self._client.request(
+                    method.upper(), url, content=data, headers=hdrs, timeout=timeout or self.timeout
+                )
+            except httpx.HTTPError as e:
+                raise RuntimeError(f"Connection error: {e}") from None
+            if resp.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                break
+            await asyncio.sleep(_retry_delay(resp, attempt))
+
+        if resp.is_error:
+            raise RuntimeError(f"HTTP {resp.status_code} {resp.reason_phrase}: {resp.text}")
+
+        if "application/json" in resp.headers.get("Content-Type", ""):
+            body = orjson.loads(resp.content)
+        else:
+            body = resp.text
+        return body, resp.status_code, dict(resp.headers)
+
+    async def get(
+        self,
+        path: str,
+        query: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | httpx.Timeout | None = None,
+    ) -> tuple[Any, int, Dict[str, str]]:
+        return await self.request("GET", self._url(path, query), headers=headers, timeout=timeout)
+
+    async def post(
+        self,
+        path: str,
+        json_body: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | httpx.Timeout | None = None,
+    ) -> tuple[Any, int, Dict[str, str]]:
+        return await self.request("POST", self._url(path), json_body=json_body, headers=headers, timeout=timeout)
+
+    async def put(
+        self,
+        path: str,
+        json_body: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | httpx.Timeout | None = None,
+    ) -> tuple[Any, int, Dict[str, str]]:
+        return await self.request("PUT", self._url(path), json_body=json_body, headers=headers, timeout=timeout)
+
+    async def delete(
+        self,
+        path: str,
+        headers: dict | None = None,
+        timeout: float | httpx.Timeout | None = None,
+    ) -> tuple[Any, int, Dict[str, str]]:
+        return await self.request("DELETE", self._url(path), headers=headers, timeout=timeout)
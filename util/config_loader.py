@@ -1,6 +1,23 @@
 import os
 import configparser
-from typing import Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+
+@lru_cache(maxsize=8)
+def _parse(path: str, mtime: float) -> Mapping[str, Mapping[str, str]]:
+    """Parse `path` once per modification time; edits to the file are picked up.
+
+    `path` should be resolved (os.path.realpath) so one file maps to one entry
+    whatever the working directory. Sections come back read-only, since every
+    caller shares the cached value.
+    """
+    cfg = configparser.ConfigParser()
+    cfg.read(path)
+    return MappingProxyType({
+        name: MappingProxyType(dict(cfg[name])) for name in cfg.sections()
+    })
 
 
 def load_config(env_section: Optional[str] = None, path: str = "config.ini") -> str:
@@ -13,15 +30,18 @@ def load_config(env_section: Optional[str] = None, path: str = "config.ini") ->
       - KeyError if the section is missing
       - ValueError if `uri` is missing/empty
     """
-    cfg = configparser.ConfigParser()
-    if not cfg.read(path):
-        raise FileNotFoundError(f"Couldn't find {path} in the current directory.")
+    resolved = os.path.realpath(path)
+    try:
+        mtime = os.stat(resolved).st_mtime
+    except OSError:
+        raise FileNotFoundError(f"Couldn't find {path} in the current directory.") from None
+    cfg = _parse(resolved, mtime)
 
     section = env_section or os.getenv("API_ENV", "api")
     if section not in cfg:
         raise KeyError(f"Section [{section}] not found in {path}.")
 
-    uri = cfg.get(section, "uri", fallback="").strip().rstrip("/")
+    uri = cfg[section].get("uri", "").strip().rstrip("/")
     if not uri:
         raise ValueError(f"[{section}] uri is empty in {path}.")
 